@@ -1,8 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import search
-from app.db.database import engine
+from app.db.database import engine, SessionLocal
 from app.db.models import Base
+from app.services.suggest_service import get_suggest_service
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -24,6 +25,15 @@ app.add_middleware(
 
 app.include_router(search.router, prefix="/search", tags=["search"])
 
+@app.on_event("startup")
+def build_suggest_index():
+    # Load product names into the typeahead prefix index
+    db = SessionLocal()
+    try:
+        get_suggest_service().refresh_products(db)
+    finally:
+        db.close()
+
 @app.get("/")
 async def root():
     return {"message": "Inventory Search Engine API"} 
\ No newline at end of file
@@ -1,15 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import text, and_, desc, asc
-from app.db.database import get_db
+from app.db.database import SessionLocal, get_db
 from app.services.qdrant_service import QdrantService
-from app.services.embedding_service import EmbeddingService
+from app.services.embedding_service import EmbeddingService, get_embedding_service
+from app.services.suggest_service import SuggestService, get_suggest_service
+from app.services.single_flight import SingleFlight
 from pydantic import BaseModel, confloat
 from typing import List, Optional
 import uuid
+import os
 
 router = APIRouter()
 
+# Shared by all search requests in this process
+search_flight = SingleFlight()
+
 class SearchRequest(BaseModel):
     query: str
     lat: float
@@ -31,13 +38,79 @@ class ProductResponse(BaseModel):
     lon: float
     description: str
 
-@router.post("/", response_model=List[ProductResponse])
-async def search(
-    request: SearchRequest,
+class SuggestionResponse(BaseModel):
+    text: str
+    source: str
+
+@router.get("/suggest", response_model=List[SuggestionResponse])
+def suggest(
+    q: str,
+    lat: float,
+    lon: float,
+    limit: int = Query(10, ge=1, le=50),
+    suggest_service: SuggestService = Depends(get_suggest_service)
+):
+    # Served from the in-memory prefix index; never touches the embedding model
+    return [
+        SuggestionResponse(text=suggestion, source=source)
+        for suggestion, source in suggest_service.suggest(q, lat, lon, limit)
+    ]
+
+@router.post("/suggest/refresh")
+def refresh_suggestions(
     db: Session = Depends(get_db),
-    qdrant_service: QdrantService = Depends(QdrantService),
-    embedding_service: EmbeddingService = Depends(EmbeddingService)
+    suggest_service: SuggestService = Depends(get_suggest_service)
 ):
+    # Pick up products added, changed or removed since the last refresh; ingest scripts call this
+    return suggest_service.refresh_products(db)
+
+@router.post("/reload")
+def reload_indexes():
+    # Switch to a newly published FAISS version; Qdrant resolves its alias per request
+    reloaded = False
+    if os.getenv("FAISS_INDEX_PATH"):
+        # Imported lazily: faiss is only installed where the FAISS backend is used
+        from app.services.faiss_service import get_faiss_service
+        reloaded = get_faiss_service().reload()
+    return {"faiss": reloaded}
+
+@router.get("/stats")
+def search_stats():
+    return {"single_flight": search_flight.stats()}
+
+def _search_key(request: SearchRequest) -> tuple:
+    # Requests that would produce identical results share one key
+    return (
+        " ".join(request.query.lower().split()),
+        request.lat,
+        request.lon,
+        request.radius_km,
+        request.max_results,
+        request.min_price,
+        request.max_price,
+        tuple(sorted(request.categories)) if request.categories else None,
+        request.sort_by,
+        request.show_only_available
+    )
+
+def _run_search(
+    request: SearchRequest,
+    qdrant_service: QdrantService,
+    embedding_service: EmbeddingService
+) -> List[ProductResponse]:
+    # Only the request that runs the search opens a session; coalesced waiters never do
+    db = SessionLocal()
+    try:
+        return _query_products(request, db, qdrant_service, embedding_service)
+    finally:
+        db.close()
+
+def _query_products(
+    request: SearchRequest,
+    db: Session,
+    qdrant_service: QdrantService,
+    embedding_service: EmbeddingService
+) -> List[ProductResponse]:
     # Get query embedding
     query_embedding = embedding_service.encode(request.query)
     
@@ -109,4 +182,24 @@ async def search(
             description=row[6]
         )
         for row in results
-    ] 
\ No newline at end of file
+    ]
+
+@router.post("/", response_model=List[ProductResponse])
+async def search(
+    request: SearchRequest,
+    qdrant_service: QdrantService = Depends(QdrantService),
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    suggest_service: SuggestService = Depends(get_suggest_service)
+):
+    # Identical concurrent searches wait on one computation, which runs in the
+    # threadpool so the event loop can keep accepting the waiters
+    results = await search_flight.do(
+        _search_key(request),
+        lambda: run_in_threadpool(_run_search, request, qdrant_service, embedding_service)
+    )
+    
+    # Queries that return products become typeahead suggestions for this area
+    if results:
+        suggest_service.record_query(request.query, request.lat, request.lon)
+    
+    return results 
\ No newline at end of file
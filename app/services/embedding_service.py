@@ -1,4 +1,5 @@
 from sentence_transformers import SentenceTransformer
+from functools import lru_cache
 import numpy as np
 
 class EmbeddingService:
@@ -9,4 +10,9 @@ class EmbeddingService:
         return self.model.encode(text)
     
     def encode_batch(self, texts: list) -> np.ndarray:
-        return self.model.encode(texts) 
\ No newline at end of file
+        return self.model.encode(texts)
+
+@lru_cache(maxsize=None)
+def get_embedding_service() -> EmbeddingService:
+    # Loading the model is far slower than encoding, so each process loads it once
+    return EmbeddingService()
@@ -1,50 +1,303 @@
 import faiss
 import numpy as np
 import os
-from typing import List
+import time
+from functools import lru_cache
+from typing import List, NamedTuple, Optional
 import uuid
 from dotenv import load_dotenv
+from app.services.quantization import QUANTIZATION_MODES
 
 load_dotenv()
 
+# Supported values for FAISS_INDEX_TYPE
+INDEX_TYPES = ("flat", "hnsw", "ivf")
+
+class IndexVersion(NamedTuple):
+    index: object
+    vectors: Optional[np.ndarray]
+    path: Optional[str]
+    # Mode of the index file itself, which may differ from FAISS_QUANTIZATION until a rebuild
+    quantization: str = "none"
+
+def _quantization_of(index) -> str:
+    if isinstance(index, faiss.IndexBinary):
+        return "binary"
+    if isinstance(index, (faiss.IndexFlat, faiss.IndexHNSWFlat, faiss.IndexIVFFlat)):
+        return "none"
+    return "int8"
+
 class FaissService:
-    def __init__(self):
-        self.index_path = os.getenv('FAISS_INDEX_PATH')
+    def __init__(
+        self,
+        index_path: Optional[str] = None,
+        quantization: Optional[str] = None,
+        index_type: Optional[str] = None,
+        hnsw_m: Optional[int] = None,
+        ef_construction: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        nlist: Optional[int] = None,
+        nprobe: Optional[int] = None
+    ):
+        # May be a symlink to the live versioned index file, see publish()
+        self.index_path = index_path or os.getenv('FAISS_INDEX_PATH')
         self.dimension = 384  # Dimension of all-MiniLM-L6-v2 embeddings
-        self.index = None
+        self.quantization = (quantization or os.getenv('FAISS_QUANTIZATION', 'none')).lower()
+        if self.quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unsupported FAISS quantization: {self.quantization}")
+        # Exact flat scan, HNSW graph or IVF inverted lists; see scripts/tune_ann.py
+        self.index_type = (index_type or os.getenv('FAISS_INDEX_TYPE', 'flat')).lower()
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unsupported FAISS index type: {self.index_type}")
+        self.hnsw_m = hnsw_m or int(os.getenv('FAISS_HNSW_M', '32'))
+        self.ef_construction = ef_construction or int(os.getenv('FAISS_HNSW_EF_CONSTRUCTION', '40'))
+        self.ef_search = ef_search or int(os.getenv('FAISS_HNSW_EF_SEARCH', '16'))
+        self.nlist = nlist or int(os.getenv('FAISS_IVF_NLIST', '100'))
+        self.nprobe = nprobe or int(os.getenv('FAISS_IVF_NPROBE', '1'))
+        # Quantized search fetches k * oversampling candidates before exact rescoring
+        self.oversampling = float(os.getenv('FAISS_OVERSAMPLING', '4.0'))
+        # Swapped as a single reference so searches never mix two versions
+        self._active = IndexVersion(None, None, None, self.quantization)
         self.load_index()
 
+    @property
+    def index(self):
+        return self._active.index
+
+    @property
+    def vectors(self) -> Optional[np.ndarray]:
+        return self._active.vectors
+
+    @property
+    def vectors_path(self) -> str:
+        # Full-precision vectors kept next to the index and memory-mapped for rescoring
+        return f"{self._active.path}.vectors.npy"
+
+    def _new_index(self):
+        if self.index_type == "hnsw":
+            if self.quantization == "int8":
+                index = faiss.IndexHNSWSQ(self.dimension, faiss.ScalarQuantizer.QT_8bit, self.hnsw_m)
+            elif self.quantization == "binary":
+                index = faiss.IndexBinaryHNSW(self.dimension, self.hnsw_m)
+            else:
+                index = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m)
+            index.hnsw.efConstruction = self.ef_construction
+            return index
+
+        if self.index_type == "ivf":
+            # IVF indexes are trained on the first batch added, which needs at least nlist vectors
+            if self.quantization == "binary":
+                return faiss.IndexBinaryIVF(faiss.IndexBinaryFlat(self.dimension), self.dimension, self.nlist)
+            quantizer = faiss.IndexFlatL2(self.dimension)
+            if self.quantization == "int8":
+                return faiss.IndexIVFScalarQuantizer(
+                    quantizer, self.dimension, self.nlist, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2
+                )
+            return faiss.IndexIVFFlat(quantizer, self.dimension, self.nlist, faiss.METRIC_L2)
+
+        if self.quantization == "int8":
+            return faiss.IndexScalarQuantizer(self.dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+        if self.quantization == "binary":
+            return faiss.IndexBinaryFlat(self.dimension)
+        return faiss.IndexFlatL2(self.dimension)
+
+    def _apply_search_params(self, index):
+        if hasattr(index, "hnsw"):
+            index.hnsw.efSearch = self.ef_search
+        if hasattr(index, "nprobe"):
+            index.nprobe = self.nprobe
+
+    def set_search_params(self, ef_search: Optional[int] = None, nprobe: Optional[int] = None):
+        """Change search-time parameters on the loaded index without rebuilding it."""
+        if ef_search is not None:
+            self.ef_search = ef_search
+        if nprobe is not None:
+            self.nprobe = nprobe
+        self._apply_search_params(self.index)
+
+    @staticmethod
+    def _write_index(index, path: str):
+        # Write to a temporary file and rename so readers never see a partial index
+        tmp_path = f"{path}.tmp"
+        if isinstance(index, faiss.IndexBinary):
+            faiss.write_index_binary(index, tmp_path)
+        else:
+            faiss.write_index(index, tmp_path)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_index(path: str):
+        # The file decides the reader, so changing FAISS_QUANTIZATION never breaks loading
+        try:
+            return faiss.read_index(path)
+        except RuntimeError:
+            return faiss.read_index_binary(path)
+
+    @staticmethod
+    def _encode(vectors: np.ndarray, quantization: str) -> np.ndarray:
+        # Binary quantization keeps one sign bit per dimension
+        if quantization == "binary":
+            return np.packbits(vectors > 0, axis=1)
+        return vectors
+
     def load_index(self):
-        if os.path.exists(self.index_path):
-            self.index = faiss.read_index(self.index_path)
+        # Resolve the live version once so the index and its vectors always match
+        path = os.path.realpath(self.index_path)
+
+        if os.path.exists(path):
+            index = self._read_index(path)
         else:
-            self.index = faiss.IndexFlatL2(self.dimension)
-            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
-            faiss.write_index(self.index, self.index_path)
+            index = self._new_index()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._write_index(index, path)
+
+        self._apply_search_params(index)
+        quantization = _quantization_of(index)
+
+        vectors = None
+        vectors_path = f"{path}.vectors.npy"
+        if quantization != "none" and os.path.exists(vectors_path):
+            vectors = np.load(vectors_path, mmap_mode='r')
+            # Rows must line up with the index; otherwise search without rescoring
+            if len(vectors) != index.ntotal:
+                vectors = None
+
+        self._active = IndexVersion(index, vectors, path, quantization)
+
+    def reload(self) -> bool:
+        """Load the published version if it changed; in-flight searches finish on the old one."""
+        if os.path.realpath(self.index_path) == self._active.path:
+            return False
+        self.load_index()
+        return True
+
+    def _append_vectors(self, vectors: np.ndarray):
+        if self.vectors is not None:
+            vectors = np.concatenate([np.asarray(self.vectors), vectors])
+
+        # Write to a temporary file and rename so open memory maps stay valid
+        tmp_path = f"{self.vectors_path}.tmp.npy"
+        np.save(tmp_path, vectors)
+        os.replace(tmp_path, self.vectors_path)
+        self._active = self._active._replace(vectors=np.load(self.vectors_path, mmap_mode='r'))
 
     def add_vectors(self, ids: List[uuid.UUID], vectors: np.ndarray):
         if not self.index:
             self.load_index()
-        
+
         # Convert UUIDs to integers for FAISS
         id_map = {i: str(pid) for i, pid in enumerate(ids)}
-        
+
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+
+        # Rescoring reads row i of the vectors file for index row i
+        quantization = self._active.quantization
+        if quantization != "none" and self.vectors is None and self.index.ntotal > 0:
+            raise ValueError(
+                f"{self._active.path} has no full-precision vectors for its {self.index.ntotal} rows; "
+                "rebuild it with scripts/build_faiss_index.py before adding more"
+            )
+
+        # Scalar quantizers and IVF centroids are learned from the first batch
+        codes = self._encode(vectors, quantization)
+        if not self.index.is_trained:
+            self.index.train(codes)
+
         # Add vectors to index
-        self.index.add(vectors)
-        
+        self.index.add(codes)
+
         # Save index
-        faiss.write_index(self.index, self.index_path)
-        
+        self._write_index(self.index, self._active.path)
+
+        # Keep full-precision copies on disk for rescoring quantized results
+        if quantization != "none":
+            self._append_vectors(vectors)
+
         return id_map
 
+    def build_version(self, ids: List[uuid.UUID], vectors: np.ndarray) -> str:
+        """Write a new index version next to the live one without touching it."""
+        version_path = f"{self.index_path}.{time.time_ns()}"
+        # Never reuse a path: the builder would load and append to that index
+        if os.path.lexists(version_path):
+            raise FileExistsError(f"Index version already exists: {version_path}")
+        builder = FaissService(
+            index_path=version_path,
+            quantization=self.quantization,
+            index_type=self.index_type,
+            hnsw_m=self.hnsw_m,
+            ef_construction=self.ef_construction,
+            ef_search=self.ef_search,
+            nlist=self.nlist,
+            nprobe=self.nprobe
+        )
+        builder.add_vectors(ids, vectors)
+        return version_path
+
+    def publish(self, version_path: str) -> Optional[str]:
+        """Atomically point index_path at version_path and return the version it replaced."""
+        is_link = os.path.islink(self.index_path)
+        previous = os.path.realpath(self.index_path) if is_link else None
+
+        link_path = f"{self.index_path}.link.tmp"
+        if os.path.lexists(link_path):
+            os.remove(link_path)
+        os.symlink(os.path.basename(version_path), link_path)
+        os.replace(link_path, self.index_path)
+
+        # The first publish replaces an unversioned index file; drop its vectors too
+        if not is_link:
+            legacy_vectors_path = f"{self.index_path}.vectors.npy"
+            if os.path.exists(legacy_vectors_path):
+                os.remove(legacy_vectors_path)
+
+        self.reload()
+        if previous == os.path.realpath(version_path):
+            return None
+        return previous
+
+    def remove_version(self, version_path: str):
+        if os.path.realpath(version_path) == os.path.realpath(self.index_path):
+            raise ValueError(f"Refusing to remove the published index version: {version_path}")
+
+        # Processes still using the version keep their loaded index and open memory maps
+        for path in (version_path, f"{version_path}.vectors.npy"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _rescore(self, vectors: Optional[np.ndarray], query_vector: np.ndarray, candidates: np.ndarray, k: int) -> np.ndarray:
+        candidates = candidates[candidates != -1]
+        if vectors is None or not len(candidates):
+            return candidates[:k]
+
+        # Exact L2 distances against the memory-mapped full-precision vectors
+        full_vectors = np.asarray(vectors[candidates], dtype='float32')
+        distances = np.sum((full_vectors - query_vector) ** 2, axis=1)
+        return candidates[np.argsort(distances, kind='stable')[:k]]
+
     def search(self, query_vector: np.ndarray, k: int) -> List[uuid.UUID]:
         if not self.index:
             self.load_index()
-        
-        # Search for similar vectors
-        distances, indices = self.index.search(query_vector.reshape(1, -1), k)
-        
+
+        # Hold one version for the whole search even if a reload swaps it meanwhile
+        active = self._active
+        query_vector = np.ascontiguousarray(query_vector, dtype='float32').reshape(1, -1)
+
+        if active.quantization == "none":
+            # Search for similar vectors
+            distances, indices = active.index.search(query_vector, k)
+            indices = indices[0]
+        else:
+            # Search the quantized index with oversampling, then rescore exactly
+            candidates = max(k, int(k * self.oversampling))
+            _, indices = active.index.search(self._encode(query_vector, active.quantization), candidates)
+            indices = self._rescore(active.vectors, query_vector[0], indices[0], k)
+
         # Convert indices back to UUIDs
         # Note: In a real implementation, you'd need to maintain a mapping
         # between FAISS indices and your UUIDs
-        return [uuid.UUID(int=idx) for idx in indices[0] if idx != -1] 
\ No newline at end of file
+        return [uuid.UUID(int=int(idx)) for idx in indices if idx != -1]
+
+@lru_cache(maxsize=None)
+def get_faiss_service() -> FaissService:
+    return FaissService()
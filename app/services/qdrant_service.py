@@ -1,46 +1,175 @@
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
+from qdrant_client.http.exceptions import UnexpectedResponse
 from qdrant_client.http.models import Distance, VectorParams
+from app.services.quantization import QUANTIZATION_MODES
 from typing import List, Optional
 import uuid
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Serving names already checked in this process; QdrantService is built per request
+_ensured_collections = set()
+
 class QdrantService:
     def __init__(self):
         self.client = QdrantClient(
             url=os.getenv("QDRANT_URL", "http://localhost:6333")
         )
-        self.collection_name = "products"
+        # Searches and ingests go through this alias, which publish() moves atomically
+        self.collection_name = "products_live"
+        # Real collections are "products" (the original) or "products_<version>"
+        self.base_collection_name = "products"
         self.vector_size = 384  # Dimension of all-MiniLM-L6-v2 embeddings
+        # Vector quantization: none, int8 (scalar) or binary
+        self.quantization = os.getenv("QDRANT_QUANTIZATION", "none").lower()
+        if self.quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unsupported Qdrant quantization: {self.quantization}")
+        # Quantized search fetches limit * oversampling candidates before rescoring
+        self.oversampling = float(os.getenv("QDRANT_OVERSAMPLING", "2.0"))
+        # HNSW parameters; unset values fall back to the Qdrant server defaults
+        self.hnsw_m = self._int_env("QDRANT_HNSW_M")
+        self.hnsw_ef_construct = self._int_env("QDRANT_HNSW_EF_CONSTRUCT")
+        self.hnsw_ef = self._int_env("QDRANT_HNSW_EF")
         self._ensure_collection()
 
+    @staticmethod
+    def _int_env(name: str) -> Optional[int]:
+        value = os.getenv(name)
+        return int(value) if value else None
+
+    def _quantization_config(self):
+        if self.quantization == "int8":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=True
+                )
+            )
+        if self.quantization == "binary":
+            return models.BinaryQuantization(
+                binary=models.BinaryQuantizationConfig(always_ram=True)
+            )
+        return None
+
+    def _hnsw_config(self):
+        if self.hnsw_m is None and self.hnsw_ef_construct is None:
+            return None
+        return models.HnswConfigDiff(
+            m=self.hnsw_m,
+            ef_construct=self.hnsw_ef_construct
+        )
+
+    def _search_params(self):
+        if self.quantization == "none" and self.hnsw_ef is None:
+            return None
+        quantization = None
+        if self.quantization != "none":
+            # Rescore quantized candidates with the original vectors
+            quantization = models.QuantizationSearchParams(
+                rescore=True,
+                oversampling=self.oversampling
+            )
+        return models.SearchParams(
+            hnsw_ef=self.hnsw_ef,
+            quantization=quantization
+        )
+
     def _ensure_collection(self):
-        collections = self.client.get_collections().collections
-        collection_names = [collection.name for collection in collections]
-        
-        if self.collection_name not in collection_names:
-            self.client.create_collection(
-                collection_name=self.collection_name,
-                vectors_config=VectorParams(
-                    size=self.vector_size,
-                    distance=Distance.COSINE
+        if self.collection_name in _ensured_collections:
+            return
+
+        if self.collection_name not in self._alias_names():
+            if self.base_collection_name not in self._collection_names():
+                try:
+                    self._create_collection(self.base_collection_name)
+                except UnexpectedResponse:
+                    # Another process (API or ingest script) created it first
+                    if self.base_collection_name not in self._collection_names():
+                        raise
+            # Serve the original collection through the alias; rebuilds then only move it
+            try:
+                self._point_alias(self.base_collection_name, replace=False)
+            except UnexpectedResponse:
+                if self.collection_name not in self._alias_names():
+                    raise
+
+        _ensured_collections.add(self.collection_name)
+
+    def _alias_names(self) -> List[str]:
+        return [alias.alias_name for alias in self.client.get_aliases().aliases]
+
+    def _collection_names(self) -> List[str]:
+        return [collection.name for collection in self.client.get_collections().collections]
+
+    def _create_collection(self, collection_name: str):
+        quantization_config = self._quantization_config()
+        self.client.create_collection(
+            collection_name=collection_name,
+            vectors_config=VectorParams(
+                size=self.vector_size,
+                distance=Distance.COSINE,
+                # Original vectors go to disk when quantized copies are kept in RAM
+                on_disk=quantization_config is not None
+            ),
+            hnsw_config=self._hnsw_config(),
+            quantization_config=quantization_config
+        )
+
+    def create_version(self, suffix: Optional[str] = None) -> str:
+        """Create an empty versioned collection to rebuild into while the alias keeps serving."""
+        version = f"{self.base_collection_name}_{suffix or time.time_ns()}"
+        self._create_collection(version)
+        return version
+
+    def _point_alias(self, collection_name: str, replace: bool):
+        operations = []
+        if replace:
+            operations.append(
+                models.DeleteAliasOperation(
+                    delete_alias=models.DeleteAlias(alias_name=self.collection_name)
                 )
             )
+        operations.append(
+            models.CreateAliasOperation(
+                create_alias=models.CreateAlias(
+                    collection_name=collection_name,
+                    alias_name=self.collection_name
+                )
+            )
+        )
+
+        # Alias changes in one request are applied atomically
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+
+    def publish(self, version: str) -> Optional[str]:
+        """Atomically point the live alias at version and return the collection it replaced."""
+        aliases = {
+            alias.alias_name: alias.collection_name
+            for alias in self.client.get_aliases().aliases
+        }
+        previous = aliases.get(self.collection_name)
+
+        self._point_alias(version, replace=previous is not None)
+        return previous if previous != version else None
 
     def add_vectors(
         self,
         ids: List[uuid.UUID],
         vectors: List[List[float]],
-        payloads: List[dict]
+        payloads: List[dict],
+        collection_name: Optional[str] = None
     ):
         points = []
         for idx, (vector, payload) in enumerate(zip(vectors, payloads)):
             points.append(
                 models.PointStruct(
-                    id=idx,
+                    # Product UUIDs keep point ids unique across batches and ingests
+                    id=str(ids[idx]),
                     vector=vector,
                     payload={
                         "product_id": str(ids[idx]),
@@ -50,7 +179,7 @@ class QdrantService:
             )
         
         self.client.upsert(
-            collection_name=self.collection_name,
+            collection_name=collection_name or self.collection_name,
             points=points
         )
 
@@ -63,7 +192,8 @@ class QdrantService:
         radius_km: Optional[float] = None,
         min_price: Optional[float] = None,
         max_price: Optional[float] = None,
-        categories: Optional[List[str]] = None
+        categories: Optional[List[str]] = None,
+        collection_name: Optional[str] = None
     ) -> List[uuid.UUID]:
         # Build filter conditions
         filter_conditions = []
@@ -117,10 +247,11 @@ class QdrantService:
         
         # Perform search
         search_result = self.client.search(
-            collection_name=self.collection_name,
+            collection_name=collection_name or self.collection_name,
             query_vector=query_vector,
             limit=k,
-            query_filter=filter_
+            query_filter=filter_,
+            search_params=self._search_params()
         )
         
         # Extract product IDs from results
@@ -0,0 +1,3 @@
+# Supported values for FAISS_QUANTIZATION and QDRANT_QUANTIZATION. Kept apart from both
+# services so neither one's client library is needed to import the other.
+QUANTIZATION_MODES = ("none", "int8", "binary")
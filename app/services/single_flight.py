@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one in-flight computation."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            # Run as a separate task so a cancelled caller does not cancel its waiters
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self._waiters[key] = 0
+            self.executions += 1
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self._waiters[key] += 1
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        del self._calls[key]
+        self.max_waiters = max(self.max_waiters, self._waiters.pop(key))
+        # Mark the exception as retrieved in case every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "waiting": sum(self._waiters.values()),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "max_waiters": self.max_waiters,
+        }
@@ -0,0 +1,274 @@
+import bisect
+import json
+import math
+import os
+import threading
+import urllib.request
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Most suggestions one request can ask for; see the /search/suggest limit
+TOP_N = 50
+# Prefixes up to this length are answered from cached top-N lists
+TOP_PREFIX_LENGTH = 12
+
+PRODUCT, QUERY = 0, 1
+
+def _normalize(value: str) -> str:
+    return " ".join(value.lower().split())
+
+class _Cell:
+    """Prefix index for a single geo cell."""
+
+    def __init__(self):
+        # Sorted (key, text) pairs, one per word suffix of text
+        self.keys: List[Tuple[str, str]] = []
+        # text -> [product weight, query weight, normalized text]
+        self.entries: Dict[str, list] = {}
+        # Prefix up to TOP_PREFIX_LENGTH chars -> up to TOP_N texts, heaviest first
+        self.top: Dict[str, List[str]] = {}
+        # Queries seen here that are not popular enough to suggest yet
+        self.query_counts: Dict[str, int] = {}
+        self.num_queries = 0
+
+    @staticmethod
+    def _suffixes(normalized: str) -> List[str]:
+        # Every word suffix, so "milk" matches "Organic Whole Milk"
+        words = normalized.split()
+        return [" ".join(words[i:]) for i in range(len(words))]
+
+    def _cached_prefixes(self, normalized: str) -> Set[str]:
+        return {
+            key[:length]
+            for key in self._suffixes(normalized)
+            for length in range(1, min(TOP_PREFIX_LENGTH, len(key)) + 1)
+        }
+
+    def _rank(self, value: str) -> tuple:
+        entry = self.entries[value]
+        return (-(entry[PRODUCT] + entry[QUERY]), value)
+
+    def _range(self, prefix: str) -> Set[str]:
+        matches = set()
+        i = bisect.bisect_left(self.keys, (prefix, ""))
+        while i < len(self.keys) and self.keys[i][0].startswith(prefix):
+            matches.add(self.keys[i][1])
+            i += 1
+        return matches
+
+    def add(self, value: str, source: int, weight: int, reindex: bool = True):
+        """Add weight to value; with reindex=False the caller must call rebuild() afterwards."""
+        entry = self.entries.get(value)
+        if entry is None:
+            entry = self.entries[value] = [0, 0, _normalize(value)]
+            if reindex:
+                for key in self._suffixes(entry[2]):
+                    bisect.insort(self.keys, (key, value))
+        if source == QUERY and not entry[QUERY]:
+            self.num_queries += 1
+        entry[source] += weight
+        if not reindex:
+            return
+
+        # Weights only grow here, so re-placing the entry keeps each list exact
+        for prefix in self._cached_prefixes(entry[2]):
+            top = self.top.setdefault(prefix, [])
+            if value in top:
+                top.remove(value)
+            bisect.insort(top, value, key=self._rank)
+            del top[TOP_N:]
+
+    def remove(self, value: str, source: int, weight: int):
+        entry = self.entries[value]
+        entry[source] -= weight
+        if source == QUERY and not entry[QUERY]:
+            self.num_queries -= 1
+
+        normalized = entry[2]
+        stale = [p for p in self._cached_prefixes(normalized) if value in self.top.get(p, ())]
+        # Text still carried by the other source stays indexed with less weight
+        if not entry[PRODUCT] and not entry[QUERY]:
+            for key in self._suffixes(normalized):
+                del self.keys[bisect.bisect_left(self.keys, (key, value))]
+            del self.entries[value]
+
+        # Refill from the full range so entries that were cut off can move up
+        for prefix in stale:
+            self.top[prefix] = sorted(self._range(prefix), key=self._rank)[:TOP_N]
+
+    def rebuild(self):
+        """Recompute keys and top lists in one sorted pass, for loading many entries at once."""
+        self.keys = sorted(
+            (key, value)
+            for value, entry in self.entries.items()
+            for key in self._suffixes(entry[2])
+        )
+        # Visiting entries heaviest first fills every top list already in order
+        self.top = {}
+        for value in sorted(self.entries, key=self._rank):
+            for prefix in self._cached_prefixes(self.entries[value][2]):
+                top = self.top.setdefault(prefix, [])
+                if len(top) < TOP_N:
+                    top.append(value)
+
+    def matches(self, prefix: str) -> Iterable[str]:
+        if len(prefix) <= TOP_PREFIX_LENGTH:
+            return self.top.get(prefix, ())
+        # Longer prefixes select few keys, so rank the whole range
+        return self._range(prefix)
+
+class SuggestService:
+    """In-memory prefix index over product names and popular queries, bucketed by geo cell."""
+
+    def __init__(self):
+        # Cell edge in degrees; lookups cover the user's cell and its 8 neighbours
+        self.cell_size = float(os.getenv("SUGGEST_CELL_DEGREES", "0.1"))
+        # Searches a query needs in one cell before it is suggested there
+        self.min_query_count = int(os.getenv("SUGGEST_MIN_QUERY_COUNT", "3"))
+        # Most queries suggested per cell; the lightest is evicted to make room
+        self.max_queries = int(os.getenv("SUGGEST_MAX_QUERIES_PER_CELL", "1000"))
+        self._cells: Dict[Tuple[int, int], _Cell] = {}
+        # product id -> (name, cell) as last indexed
+        self._products: Dict[str, Tuple[str, Tuple[int, int]]] = {}
+        self._lock = threading.Lock()
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    def _remove_product(self, product_id: str):
+        name, cell = self._products.pop(product_id)
+        self._cells[cell].remove(name, PRODUCT, 1)
+
+    def add_product(self, product_id: str, name: str, lat: float, lon: float) -> bool:
+        """Index a product, re-placing it if its name or cell changed; False if already indexed."""
+        product = (name, self._cell(lat, lon))
+        with self._lock:
+            if self._products.get(product_id) == product:
+                return False
+            if product_id in self._products:
+                self._remove_product(product_id)
+            self._products[product_id] = product
+            self._cells.setdefault(product[1], _Cell()).add(name, PRODUCT, 1)
+            return True
+
+    def record_query(self, query: str, lat: float, lon: float):
+        query = _normalize(query)
+        if not query:
+            return
+
+        with self._lock:
+            cell = self._cells.setdefault(self._cell(lat, lon), _Cell())
+            if cell.entries.get(query, (0, 0))[QUERY]:
+                cell.add(query, QUERY, 1)
+                return
+
+            count = cell.query_counts.get(query, 0) + 1
+            if count < self.min_query_count:
+                cell.query_counts[query] = count
+                # Forget the rarer half of candidates once too many accumulate
+                if len(cell.query_counts) > 10 * self.max_queries:
+                    ranked = sorted(cell.query_counts.items(), key=lambda item: -item[1])
+                    cell.query_counts = dict(ranked[:5 * self.max_queries])
+                return
+
+            if cell.num_queries >= self.max_queries:
+                # Only query weight is evicted; product names stay suggestible
+                lightest = min(
+                    (value for value, entry in cell.entries.items() if entry[QUERY]),
+                    key=lambda value: cell.entries[value][QUERY]
+                )
+                if cell.entries[lightest][QUERY] > count:
+                    cell.query_counts[query] = count
+                    return
+                cell.remove(lightest, QUERY, cell.entries[lightest][QUERY])
+
+            cell.query_counts.pop(query, None)
+            cell.add(query, QUERY, count)
+
+    def refresh_products(self, db: Session) -> Dict[str, int]:
+        """Sync the index with the products table and return how many were added, updated and removed."""
+        rows = db.execute(text("""
+            SELECT id, name,
+                   ST_Y(location::geometry) as lat,
+                   ST_X(location::geometry) as lon
+            FROM products
+        """)).fetchall()
+        current = {str(row[0]): (row[1], self._cell(row[2], row[3])) for row in rows}
+
+        with self._lock:
+            removed = [pid for pid in self._products if pid not in current]
+            changed = [pid for pid, product in current.items() if self._products.get(pid) != product]
+            updated = sum(pid in self._products for pid in changed)
+            for pid in removed:
+                self._remove_product(pid)
+            for pid in changed:
+                if pid in self._products:
+                    self._remove_product(pid)
+
+            additions: Dict[Tuple[int, int], List[str]] = {}
+            for pid in changed:
+                name, cell = current[pid]
+                self._products[pid] = (name, cell)
+                additions.setdefault(cell, []).append(name)
+
+            for cell_key, names in additions.items():
+                cell = self._cells.setdefault(cell_key, _Cell())
+                # One sorted pass beats an insort per key once a cell grows by a tenth or more
+                bulk = len(names) * 10 >= len(cell.entries) + len(names)
+                for name in names:
+                    cell.add(name, PRODUCT, 1, reindex=not bulk)
+                if bulk:
+                    cell.rebuild()
+
+        return {"added": len(changed) - updated, "updated": updated, "removed": len(removed)}
+
+    def suggest(self, prefix: str, lat: float, lon: float, limit: int = 10) -> List[Tuple[str, str]]:
+        prefix = _normalize(prefix)
+        if not prefix:
+            return []
+
+        cell_lat, cell_lon = self._cell(lat, lon)
+        # normalized text -> [text, source, weight]
+        matches: Dict[str, list] = {}
+
+        with self._lock:
+            for d_lat in (-1, 0, 1):
+                for d_lon in (-1, 0, 1):
+                    cell = self._cells.get((cell_lat + d_lat, cell_lon + d_lon))
+                    if cell is None:
+                        continue
+                    for value in cell.matches(prefix):
+                        product_weight, query_weight, normalized = cell.entries[value]
+                        source = "product" if product_weight else "query"
+                        weight = product_weight + query_weight
+                        match = matches.get(normalized)
+                        if match is None:
+                            matches[normalized] = [value, source, weight]
+                            continue
+                        match[2] += weight
+                        # Prefer the product's own spelling over a typed query
+                        if source == "product":
+                            match[0], match[1] = value, source
+
+        ranked = sorted(matches.values(), key=lambda m: (-m[2], m[0]))
+        return [(m[0], m[1]) for m in ranked[:limit]]
+
+def request_refresh(api_url: Optional[str] = None) -> Optional[dict]:
+    """Ask the running API to index products committed by another process, such as an ingest script."""
+    url = f"{(api_url or os.getenv('SEARCH_API_URL', 'http://localhost:8000')).rstrip('/')}/search/suggest/refresh"
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, method="POST"), timeout=60) as response:
+            return json.load(response)
+    except OSError as e:
+        # The API may not be running; it syncs all products when it starts
+        print(f"Could not refresh suggestions at {url}: {e}")
+        return None
+
+@lru_cache(maxsize=None)
+def get_suggest_service() -> SuggestService:
+    return SuggestService()
@@ -4,6 +4,7 @@ from app.db.models import Product
 from app.services.faiss_service import FaissService
 from app.services.embedding_service import EmbeddingService
 import numpy as np
+import os
 
 def build_faiss_index():
     # Initialize services
@@ -30,13 +31,21 @@ def build_faiss_index():
         # Encode descriptions in batch
         embeddings = embedding_service.encode_batch(descriptions)
         
-        # Add vectors to FAISS index
-        faiss_service.add_vectors(product_ids, embeddings)
+        # Build a new index version while the live one keeps serving
+        version_path = faiss_service.build_version(product_ids, embeddings)
         
-        print(f"Successfully built FAISS index with {len(products)} products.")
+        # Swap it in atomically and drop the version it replaced
+        previous_path = faiss_service.publish(version_path)
+        if previous_path:
+            faiss_service.remove_version(previous_path)
+        
+        print(f"Successfully built FAISS index with {len(products)} products at {version_path}.")
+        print("Run POST /search/reload to switch running API processes to it.")
     
     finally:
         db.close()
 
 if __name__ == "__main__":
+    # Yield CPU to the API process serving searches meanwhile
+    os.nice(10)
     build_faiss_index() 
\ No newline at end of file
@@ -5,6 +5,7 @@ from app.db.database import SessionLocal, engine
 from app.db.models import Base, Product
 from app.services.faiss_service import FaissService
 from app.services.embedding_service import EmbeddingService
+from app.services.suggest_service import request_refresh
 from geoalchemy2.shape import from_shape
 from shapely.geometry import Point
 import os
@@ -56,6 +57,9 @@ def ingest_products(json_file: str):
     finally:
         db.close()
 
+    # Let the running API add the new products to its typeahead index
+    request_refresh()
+
 if __name__ == "__main__":
     # Initialize database
     init_db()
@@ -5,6 +5,7 @@ from app.db.database import SessionLocal, engine
 from app.db.models import Base, Product
 from app.services.qdrant_service import QdrantService
 from app.services.embedding_service import EmbeddingService
+from app.services.suggest_service import request_refresh
 from geoalchemy2.shape import from_shape
 from shapely.geometry import Point
 import os
@@ -67,6 +68,8 @@ def ingest_products(json_file: str):
         db.add_all(db_products)
         db.commit()
         print(f"Successfully ingested {len(products)} products")
+        # Let the running API add the new products to its typeahead index
+        request_refresh()
     except Exception as e:
         print(f"Error ingesting products: {e}")
         db.rollback()
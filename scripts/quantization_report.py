@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+import json
+import os
+import sys
+import tempfile
+import uuid
+
+import numpy as np
+
+# Add the app directory to Python path
+sys.path.insert(0, '/app')
+
+from qdrant_client.http import models
+from app.services.faiss_service import FaissService
+from app.services.qdrant_service import QdrantService
+from app.services.quantization import QUANTIZATION_MODES
+from app.services.embedding_service import EmbeddingService
+
+K = 10
+# Below this many products recall@k mostly measures catalog size
+MIN_MEANINGFUL_CATALOG = 1000
+
+def file_size(path: str) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+def exact_neighbours(embeddings: np.ndarray, queries: np.ndarray, k: int):
+    # Exact cosine neighbours from one matrix product over normalized vectors
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    top = np.argpartition(-(queries @ embeddings.T), k - 1, axis=1)[:, :k]
+    return [set(row.tolist()) for row in top]
+
+def recall_at_k(neighbours, truth, k: int) -> float:
+    hits = sum(len(set(found) & expected) for found, expected in zip(neighbours, truth))
+    return hits / (len(truth) * k)
+
+def qdrant_ram_bytes_per_vector(info, dimension: int) -> int:
+    # Estimated from the collection config: originals in RAM unless on disk, plus quantized copies
+    original = 0 if info.config.params.vectors.on_disk else 4 * dimension
+    quantization = info.config.quantization_config
+    if isinstance(quantization, models.ScalarQuantization):
+        return original + dimension
+    if isinstance(quantization, models.BinaryQuantization):
+        return original + dimension // 8
+    return original
+
+def faiss_report(embeddings: np.ndarray, queries: np.ndarray, truth, k: int):
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode in QUANTIZATION_MODES:
+            faiss_service = FaissService(
+                index_path=os.path.join(tmp_dir, mode, 'index.faiss'),
+                quantization=mode
+            )
+            faiss_service.add_vectors(list(range(len(embeddings))), embeddings)
+            neighbours = [[pid.int for pid in faiss_service.search(q, k)] for q in queries]
+            rows.append({
+                'backend': 'faiss',
+                'mode': mode,
+                'recall': recall_at_k(neighbours, truth, k),
+                # Codes held in RAM; rescoring vectors are memory-mapped from disk
+                'ram_bytes': faiss_service.index.code_size,
+                'disk_bytes': file_size(faiss_service.vectors_path) / len(embeddings)
+            })
+    return rows
+
+def qdrant_report(embeddings: np.ndarray, queries: np.ndarray, truth, k: int):
+    qdrant_service = QdrantService()
+    point_ids = [uuid.UUID(int=i) for i in range(len(embeddings))]
+
+    rows = []
+    for mode in QUANTIZATION_MODES:
+        qdrant_service.quantization = mode
+        collection_name = qdrant_service.create_version(suffix=f"report_{mode}")
+        try:
+            qdrant_service.add_vectors(
+                point_ids,
+                embeddings.tolist(),
+                [{} for _ in point_ids],
+                collection_name=collection_name
+            )
+            neighbours = [
+                [pid.int for pid in qdrant_service.search(q.tolist(), k, collection_name=collection_name)]
+                for q in queries
+            ]
+            info = qdrant_service.client.get_collection(collection_name)
+            ram_bytes = qdrant_ram_bytes_per_vector(info, qdrant_service.vector_size)
+            rows.append({
+                'backend': 'qdrant',
+                'mode': mode,
+                'recall': recall_at_k(neighbours, truth, k),
+                'ram_bytes': ram_bytes,
+                'disk_bytes': 4 * qdrant_service.vector_size if info.config.params.vectors.on_disk else 0
+            })
+        finally:
+            qdrant_service.client.delete_collection(collection_name)
+    return rows
+
+def quantization_report(json_file: str):
+    embedding_service = EmbeddingService()
+
+    # Read products from JSON file
+    with open(json_file, 'r') as f:
+        products = json.load(f)
+
+    print(f"Encoding {len(products)} products...")
+
+    embeddings = embedding_service.encode_batch([p['description'] for p in products])
+    # Product names double as realistic short queries
+    queries = embedding_service.encode_batch([p['name'] for p in products])
+
+    # Keep k well below the catalog size so recall is not trivially high
+    k = max(1, min(K, len(products) // 10))
+    if len(products) < MIN_MEANINGFUL_CATALOG:
+        print(
+            f"Warning: only {len(products)} products; recall@{k} is noisy and "
+            f"Qdrant may search small collections without their quantized vectors."
+        )
+    truth = exact_neighbours(embeddings, queries, k)
+
+    rows = faiss_report(embeddings, queries, truth, k) + qdrant_report(embeddings, queries, truth, k)
+
+    print()
+    print(f"| Backend | Quantization | Recall@{k} | RAM bytes/vector | Rescore bytes/vector (disk) |")
+    print("|---|---|---|---|---|")
+    for row in rows:
+        print(
+            f"| {row['backend']} | {row['mode']} | {row['recall']:.3f} | "
+            f"{row['ram_bytes']:.0f} | {row['disk_bytes']:.0f} |"
+        )
+
+if __name__ == "__main__":
+    json_file = os.path.join(os.path.dirname(__file__), '..', 'sample_data', 'grocery_products.json')
+    quantization_report(json_file)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+
+# Add the app directory to Python path
+sys.path.insert(0, '/app')
+
+from qdrant_client.http import models
+from sqlalchemy import text
+from app.db.database import SessionLocal
+from app.services.qdrant_service import QdrantService
+from app.services.embedding_service import EmbeddingService
+
+BATCH_SIZE = 256
+# Searches and ingests that resolved the alias before the swap finish within this
+GRACE_SECONDS = float(os.getenv("QDRANT_REBUILD_GRACE_SECONDS", "30"))
+
+def carry_over_points(qdrant_service: QdrantService, previous: str, version: str) -> int:
+    """Copy points that ingests wrote to previous during the rebuild into version."""
+    carried = 0
+    offset = None
+    while True:
+        records, offset = qdrant_service.client.scroll(
+            collection_name=previous,
+            limit=BATCH_SIZE,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        existing = {
+            record.id
+            for record in qdrant_service.client.retrieve(
+                collection_name=version,
+                ids=[record.id for record in records],
+                with_payload=False,
+                with_vectors=False
+            )
+        }
+        missing = [record for record in records if record.id not in existing]
+        if missing:
+            qdrant_service.client.upsert(
+                collection_name=version,
+                points=[
+                    models.PointStruct(id=record.id, vector=record.vector, payload=record.payload)
+                    for record in missing
+                ]
+            )
+            carried += len(missing)
+        if offset is None:
+            return carried
+
+def rebuild_qdrant_collection():
+    # Initialize services
+    qdrant_service = QdrantService()
+    embedding_service = EmbeddingService()
+
+    # Get all products from database
+    db = SessionLocal()
+    try:
+        products = db.execute(text("""
+            SELECT id, name, description, price, category,
+                   ST_Y(location::geometry) as lat,
+                   ST_X(location::geometry) as lon
+            FROM products
+        """)).fetchall()
+    finally:
+        db.close()
+
+    if not products:
+        print("No products found in database.")
+        return
+
+    # Fill a new versioned collection while the alias keeps serving the old one
+    version = qdrant_service.create_version()
+    print(f"Rebuilding {len(products)} products into {version}...")
+
+    for start in range(0, len(products), BATCH_SIZE):
+        batch = products[start:start + BATCH_SIZE]
+        embeddings = embedding_service.encode_batch([row[2] for row in batch])
+        payloads = [
+            {
+                'name': row[1],
+                'price': row[3],
+                'category': row[4],
+                'location': {
+                    'lat': row[5],
+                    'lon': row[6]
+                }
+            }
+            for row in batch
+        ]
+        qdrant_service.add_vectors(
+            [row[0] for row in batch],
+            embeddings.tolist(),
+            payloads,
+            collection_name=version
+        )
+
+    # Swap the alias atomically; new searches and ingests now use the new version
+    previous = qdrant_service.publish(version)
+    if previous:
+        # Let requests that resolved the old collection finish, then keep what
+        # ingests wrote there after the product snapshot before dropping it
+        print(f"Waiting {GRACE_SECONDS:.0f}s before deleting {previous}...")
+        time.sleep(GRACE_SECONDS)
+        carried = carry_over_points(qdrant_service, previous, version)
+        if carried:
+            print(f"Carried over {carried} points ingested during the rebuild")
+        qdrant_service.client.delete_collection(previous)
+
+    print(f"Successfully published {version} as '{qdrant_service.collection_name}'")
+
+if __name__ == "__main__":
+    # Yield CPU to the API process serving searches meanwhile
+    os.nice(10)
+    rebuild_qdrant_collection()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add the app directory to Python path
+sys.path.insert(0, '/app')
+
+from qdrant_client.http import models
+from app.services.qdrant_service import QdrantService
+from app.services.quantization import QUANTIZATION_MODES
+
+# Index-time and search-time grids, keyed by the environment variables they map to
+FAISS_HNSW_BUILDS = [
+    {"FAISS_HNSW_M": m, "FAISS_HNSW_EF_CONSTRUCTION": ef_construction}
+    for m in (16, 32)
+    for ef_construction in (40, 100)
+]
+FAISS_HNSW_SEARCHES = [{"FAISS_HNSW_EF_SEARCH": ef} for ef in (16, 32, 64, 128)]
+FAISS_IVF_NPROBES = (1, 4, 16, 64)
+
+QDRANT_BUILDS = [
+    {"QDRANT_HNSW_M": m, "QDRANT_HNSW_EF_CONSTRUCT": ef_construct}
+    for m in (8, 16, 32)
+    for ef_construct in (64, 128)
+]
+QDRANT_SEARCHES = [{"QDRANT_HNSW_EF": ef} for ef in (16, 32, 64, 128)]
+
+# FaissService keyword for each tuned FAISS variable
+FAISS_ARGS = {
+    "FAISS_INDEX_TYPE": "index_type",
+    "FAISS_QUANTIZATION": "quantization",
+    "FAISS_HNSW_M": "hnsw_m",
+    "FAISS_HNSW_EF_CONSTRUCTION": "ef_construction",
+    "FAISS_IVF_NLIST": "nlist",
+}
+
+BATCH_SIZE = 256
+
+def load_embeddings(qdrant_service: QdrantService):
+    """Scroll every stored vector and its product id out of the live collection."""
+    product_ids = []
+    vectors = []
+    offset = None
+    while True:
+        records, offset = qdrant_service.client.scroll(
+            collection_name=qdrant_service.collection_name,
+            limit=1024,
+            offset=offset,
+            with_payload=["product_id"],
+            with_vectors=True
+        )
+        for record in records:
+            product_ids.append(record.payload["product_id"])
+            vectors.append(record.vector)
+        if offset is None:
+            break
+    return product_ids, np.asarray(vectors, dtype='float32')
+
+def ground_truth(vectors: np.ndarray, query_rows: np.ndarray, k: int):
+    # Exact cosine neighbours from one matrix product over normalized vectors
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = vectors[query_rows] @ vectors.T
+    # Queries are stored vectors; exclude each one's match with itself
+    scores[np.arange(len(query_rows)), query_rows] = -np.inf
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row.tolist()) for row in top]
+
+def measure(search, vectors: np.ndarray, query_rows: np.ndarray, truth, k: int):
+    """Recall@k and p95 latency of search(query), which returns k + 1 row positions."""
+    latencies = []
+    hits = 0
+    for row, expected in zip(query_rows, truth):
+        start = time.perf_counter()
+        found = search(vectors[row])
+        latencies.append(time.perf_counter() - start)
+        # Drop the query's own row, which every index finds and the truth leaves out
+        found = [position for position in found if position != row][:k]
+        hits += len(set(found) & expected)
+    return hits / (len(query_rows) * k), float(np.percentile(latencies, 95)) * 1000
+
+def sweep_faiss(vectors: np.ndarray, query_rows: np.ndarray, truth, k: int):
+    # Imported lazily: faiss is only installed where the FAISS backend is used
+    from app.services.faiss_service import FaissService
+
+    # Roughly 4 * sqrt(n) lists, keeping the 39 training points per list FAISS asks for
+    nlist = max(1, min(int(4 * math.sqrt(len(vectors))), len(vectors) // 39))
+    builds = [({"FAISS_INDEX_TYPE": "flat"}, [{}])]
+    builds += [({"FAISS_INDEX_TYPE": "hnsw", **build}, FAISS_HNSW_SEARCHES) for build in FAISS_HNSW_BUILDS]
+    builds.append((
+        {"FAISS_INDEX_TYPE": "ivf", "FAISS_IVF_NLIST": nlist},
+        [{"FAISS_IVF_NPROBE": nprobe} for nprobe in FAISS_IVF_NPROBES if nprobe <= nlist]
+    ))
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for quantization in QUANTIZATION_MODES:
+            for build, searches in builds:
+                build = {**build, "FAISS_QUANTIZATION": quantization}
+                faiss_service = FaissService(
+                    index_path=os.path.join(tmp_dir, f"{len(results)}.faiss"),
+                    **{FAISS_ARGS[name]: value for name, value in build.items()}
+                )
+                faiss_service.add_vectors(list(range(len(vectors))), vectors)
+
+                for search in searches:
+                    faiss_service.set_search_params(
+                        ef_search=search.get("FAISS_HNSW_EF_SEARCH"),
+                        nprobe=search.get("FAISS_IVF_NPROBE")
+                    )
+                    recall, p95_ms = measure(
+                        lambda query: [pid.int for pid in faiss_service.search(query, k + 1)],
+                        vectors, query_rows, truth, k
+                    )
+                    results.append({"config": {**build, **search}, "recall": recall, "p95_ms": p95_ms})
+                    print(f"faiss  {results[-1]['config']}  recall@{k}={recall:.3f}  p95={p95_ms:.2f}ms")
+    return results
+
+def wait_until_indexed(qdrant_service: QdrantService, collection_name: str, timeout: float = 600):
+    deadline = time.time() + timeout
+    while qdrant_service.client.get_collection(collection_name).status != models.CollectionStatus.GREEN:
+        if time.time() > deadline:
+            raise TimeoutError(f"Collection {collection_name} did not finish indexing")
+        time.sleep(1)
+
+def sweep_qdrant(qdrant_service: QdrantService, product_ids, vectors: np.ndarray, query_rows: np.ndarray, truth, k: int):
+    positions = {product_id: i for i, product_id in enumerate(product_ids)}
+
+    results = []
+    for quantization in QUANTIZATION_MODES:
+        for build in QDRANT_BUILDS:
+            qdrant_service.quantization = quantization
+            qdrant_service.hnsw_m = build["QDRANT_HNSW_M"]
+            qdrant_service.hnsw_ef_construct = build["QDRANT_HNSW_EF_CONSTRUCT"]
+            collection_name = qdrant_service.create_version(
+                suffix=f"tune_{quantization}_m{build['QDRANT_HNSW_M']}_ef{build['QDRANT_HNSW_EF_CONSTRUCT']}"
+            )
+            try:
+                for start in range(0, len(vectors), BATCH_SIZE):
+                    batch_ids = product_ids[start:start + BATCH_SIZE]
+                    qdrant_service.add_vectors(
+                        batch_ids,
+                        vectors[start:start + BATCH_SIZE].tolist(),
+                        [{} for _ in batch_ids],
+                        collection_name=collection_name
+                    )
+                wait_until_indexed(qdrant_service, collection_name)
+
+                for search in QDRANT_SEARCHES:
+                    qdrant_service.hnsw_ef = search["QDRANT_HNSW_EF"]
+                    recall, p95_ms = measure(
+                        lambda query: [
+                            positions[str(pid)]
+                            for pid in qdrant_service.search(query.tolist(), k + 1, collection_name=collection_name)
+                        ],
+                        vectors, query_rows, truth, k
+                    )
+                    config = {"QDRANT_QUANTIZATION": quantization, **build, **search}
+                    results.append({"config": config, "recall": recall, "p95_ms": p95_ms})
+                    print(f"qdrant {config}  recall@{k}={recall:.3f}  p95={p95_ms:.2f}ms")
+            finally:
+                qdrant_service.client.delete_collection(collection_name)
+    return results
+
+def pareto_front(results):
+    """Configurations that no other configuration beats on both recall and p95 latency."""
+    front = []
+    best_recall = -1.0
+    for result in sorted(results, key=lambda r: (r["p95_ms"], -r["recall"])):
+        if result["recall"] > best_recall:
+            front.append(result)
+            best_recall = result["recall"]
+    return front
+
+def recommend(results, target_recall: float):
+    # Fastest configuration that reaches the target, else the most accurate one
+    meeting = [r for r in results if r["recall"] >= target_recall]
+    if meeting:
+        return min(meeting, key=lambda r: r["p95_ms"])
+    return max(results, key=lambda r: (r["recall"], -r["p95_ms"]))
+
+def report(backend: str, results, k: int, target_recall: float):
+    print()
+    print(f"## {backend} Pareto front")
+    print()
+    print(f"| Recall@{k} | p95 (ms) | Configuration |")
+    print("|---|---|---|")
+    for result in pareto_front(results):
+        config = " ".join(f"{name}={value}" for name, value in result["config"].items())
+        print(f"| {result['recall']:.3f} | {result['p95_ms']:.2f} | {config} |")
+
+    best = recommend(results, target_recall)
+    print()
+    print(f"Recommended for recall@{k} >= {target_recall} (recall {best['recall']:.3f}, p95 {best['p95_ms']:.2f} ms), add to .env:")
+    for name, value in best["config"].items():
+        print(f"{name}={value}")
+
+def tune_ann(backends, k: int, num_queries: int, target_recall: float, output: str = None):
+    qdrant_service = QdrantService()
+    product_ids, vectors = load_embeddings(qdrant_service)
+
+    if len(vectors) < 2:
+        print("Need at least two embeddings in Qdrant; ingest products first.")
+        return
+
+    # Each query is a stored embedding, so only the other len(vectors) - 1 can be neighbours
+    k = min(k, len(vectors) - 1)
+    rng = np.random.default_rng(0)
+    query_rows = rng.choice(len(vectors), size=min(num_queries, len(vectors)), replace=False)
+    truth = ground_truth(vectors, query_rows, k)
+    print(f"Computed exact top-{k} for {len(query_rows)} queries over {len(vectors)} embeddings")
+
+    results = {}
+    if "faiss" in backends:
+        results["faiss"] = sweep_faiss(vectors, query_rows, truth, k)
+    if "qdrant" in backends:
+        results["qdrant"] = sweep_qdrant(qdrant_service, product_ids, vectors, query_rows, truth, k)
+        if len(vectors) < 20000:
+            print("Note: Qdrant searches small collections exhaustively, so HNSW settings matter only on larger catalogs.")
+
+    for backend, backend_results in results.items():
+        report(backend, backend_results, k, target_recall)
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote all measurements to {output}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep ANN parameters and report recall vs p95 latency")
+    parser.add_argument("--backend", choices=["faiss", "qdrant", "all"], default="all")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--output", help="Write every measurement as JSON")
+    args = parser.parse_args()
+
+    backends = ["faiss", "qdrant"] if args.backend == "all" else [args.backend]
+    tune_ann(backends, args.k, args.queries, args.target_recall, args.output)
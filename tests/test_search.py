@@ -1,8 +1,12 @@
+import asyncio
+import os
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 from app.services.embedding_service import EmbeddingService
 from app.services.faiss_service import FaissService
+from app.services.suggest_service import SuggestService, get_suggest_service
+from app.services.single_flight import SingleFlight
 import numpy as np
 
 client = TestClient(app)
@@ -47,4 +51,173 @@ def test_faiss_service():
     results = faiss_service.search(test_vector, k=5)
     
     assert isinstance(results, list)
-    assert len(results) <= 5 
\ No newline at end of file
+    assert len(results) <= 5 
+
+def test_faiss_service_quantized_rescoring(tmp_path):
+    vectors = np.random.rand(50, 384).astype('float32')
+    faiss_service = FaissService(index_path=str(tmp_path / "index.faiss"), quantization="int8")
+    faiss_service.add_vectors(list(range(50)), vectors)
+    results = faiss_service.search(vectors[7], k=5)
+
+    assert len(results) == 5
+    assert results[0].int == 7  # Exact rescoring puts the stored vector first
+
+def test_faiss_service_quantization_switch_rebuilds(tmp_path):
+    index_path = str(tmp_path / "index.faiss")
+    vectors = np.random.rand(50, 384).astype('float32')
+    FaissService(index_path=index_path).add_vectors(list(range(50)), vectors)
+
+    # The existing float index still loads and serves under the new setting
+    faiss_service = FaissService(index_path=index_path, quantization="binary")
+    assert faiss_service.search(vectors[7], k=1)[0].int == 7
+
+    faiss_service.publish(faiss_service.build_version(list(range(50)), vectors))
+
+    assert faiss_service.index.ntotal == 50
+    assert faiss_service.search(vectors[7], k=5)[0].int == 7
+    assert FaissService(index_path=index_path, quantization="none").search(vectors[7], k=5)[0].int == 7
+
+def test_faiss_service_keeps_rescoring_vectors_aligned(tmp_path):
+    index_path = str(tmp_path / "index.faiss")
+    vectors = np.random.rand(310, 384).astype('float32')
+    FaissService(index_path=index_path).add_vectors(list(range(300)), vectors[:300])
+
+    # Appending under a new setting keeps the file's own mode until a rebuild
+    faiss_service = FaissService(index_path=index_path, quantization="int8")
+    faiss_service.add_vectors(list(range(300, 310)), vectors[300:])
+    assert faiss_service.search(vectors[305], k=5)[0].int == 305
+
+    # A quantized index whose vectors file is gone must not grow out of line with it
+    faiss_service.publish(faiss_service.build_version(list(range(310)), vectors))
+    os.remove(faiss_service.vectors_path)
+    faiss_service = FaissService(index_path=index_path, quantization="int8")
+    assert len(faiss_service.search(vectors[7], k=5)) == 5
+    with pytest.raises(ValueError):
+        faiss_service.add_vectors([310], vectors[:1])
+
+def test_suggest_endpoint():
+    get_suggest_service().add_product("test-milk", "Organic Whole Milk", 40.7128, -74.0060)
+
+    response = client.get("/search/suggest", params={"q": "whole m", "lat": 40.71, "lon": -74.0})
+
+    assert response.status_code == 200
+    assert {"text": "Organic Whole Milk", "source": "product"} in response.json()
+
+def test_suggest_service_geo_cells():
+    suggest_service = SuggestService()
+    suggest_service.add_product("1", "Fresh Bananas", 40.7128, -74.0060)
+    for _ in range(suggest_service.min_query_count):
+        suggest_service.record_query("banana bread", 40.7128, -74.0060)
+    suggest_service.record_query("bananas for john", 40.7128, -74.0060)
+
+    assert suggest_service.suggest("ban", 40.7128, -74.0060) == [
+        ("banana bread", "query"),
+        ("Fresh Bananas", "product"),
+    ]
+    assert suggest_service.suggest("ban", 12.9716, 77.5946) == []
+
+def test_suggest_service_ranks_before_truncating():
+    suggest_service = SuggestService()
+    for i in range(100):
+        suggest_service.add_product(f"aaa-{i}", f"aaa item {i}", 40.7128, -74.0060)
+    suggest_service.add_product("juice-1", "Apple Juice", 40.7128, -74.0060)
+    suggest_service.add_product("juice-2", "Apple Juice", 40.7128, -74.0060)
+
+    assert suggest_service.suggest("a", 40.7128, -74.0060, limit=1) == [("Apple Juice", "product")]
+
+def test_suggest_service_keeps_products_when_evicting_queries():
+    suggest_service = SuggestService()
+    suggest_service.max_queries = 1
+    suggest_service.add_product("1", "milk", 40.7128, -74.0060)
+    for query in ("milk", "eggs"):
+        for _ in range(suggest_service.min_query_count):
+            suggest_service.record_query(query, 40.7128, -74.0060)
+
+    assert suggest_service.suggest("mi", 40.7128, -74.0060) == [("milk", "product")]
+
+def test_suggest_service_refresh_syncs_products():
+    class Rows:
+        def __init__(self, rows):
+            self.rows = rows
+
+        def execute(self, statement):
+            return self
+
+        def fetchall(self):
+            return self.rows
+
+    suggest_service = SuggestService()
+    suggest_service.refresh_products(Rows([("1", "Whole Milk", 40.7128, -74.0060), ("2", "Eggs", 40.7128, -74.0060)]))
+
+    assert suggest_service.refresh_products(Rows([("1", "Oat Milk", 40.7128, -74.0060)])) == {
+        "added": 0, "updated": 1, "removed": 1
+    }
+    assert suggest_service.suggest("milk", 40.7128, -74.0060) == [("Oat Milk", "product")]
+    assert suggest_service.suggest("eggs", 40.7128, -74.0060) == []
+
+def test_single_flight_coalesces_concurrent_calls():
+    single_flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return ["result"]
+
+    async def run():
+        return await asyncio.gather(*(single_flight.do("milk", compute) for _ in range(5)))
+
+    results = asyncio.run(run())
+
+    assert results == [["result"]] * 5
+    assert len(calls) == 1
+    assert single_flight.stats()["coalesced"] == 4
+    assert single_flight.stats()["max_waiters"] == 4
+    assert single_flight.stats()["in_flight"] == 0
+
+def test_faiss_service_publish_and_reload(tmp_path):
+    index_path = str(tmp_path / "index.faiss")
+    vectors = np.random.rand(20, 384).astype('float32')
+    live = FaissService(index_path=index_path)
+    reader = FaissService(index_path=index_path)
+
+    version_path = live.build_version(list(range(20)), vectors)
+    live.publish(version_path)
+
+    assert reader.index.ntotal == 0  # Keeps serving the old version until reloaded
+    assert reader.reload()
+    assert reader.index.ntotal == 20
+    assert not reader.reload()
+    # Republishing the live version must not offer it up for removal
+    assert live.publish(version_path) is None
+    with pytest.raises(ValueError):
+        live.remove_version(version_path)
+
+def test_faiss_service_applies_tuning_recommendation(tmp_path, monkeypatch):
+    index_path = str(tmp_path / "index.faiss")
+    vectors = np.random.rand(200, 384).astype('float32')
+    FaissService(index_path=index_path).add_vectors(list(range(200)), vectors)
+
+    # Variables as printed by scripts/tune_ann.py, then the build_faiss_index.py steps
+    monkeypatch.setenv("FAISS_INDEX_PATH", index_path)
+    monkeypatch.setenv("FAISS_INDEX_TYPE", "hnsw")
+    monkeypatch.setenv("FAISS_QUANTIZATION", "binary")
+    monkeypatch.setenv("FAISS_HNSW_M", "16")
+    monkeypatch.setenv("FAISS_HNSW_EF_SEARCH", "64")
+    faiss_service = FaissService()
+    previous_path = faiss_service.publish(faiss_service.build_version(list(range(200)), vectors))
+    if previous_path:
+        faiss_service.remove_version(previous_path)
+
+    reloaded = FaissService()
+    assert reloaded.index.hnsw.efSearch == 64
+    assert reloaded.search(vectors[3], k=5)[0].int == 3
+
+def test_faiss_service_hnsw_search_params(tmp_path):
+    vectors = np.random.rand(200, 384).astype('float32')
+    faiss_service = FaissService(index_path=str(tmp_path / "index.faiss"), index_type="hnsw", hnsw_m=16)
+    faiss_service.add_vectors(list(range(200)), vectors)
+    faiss_service.set_search_params(ef_search=64)
+
+    assert faiss_service.index.hnsw.efSearch == 64
+    assert faiss_service.search(vectors[3], k=1)[0].int == 3